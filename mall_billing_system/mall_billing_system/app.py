@@ -5,8 +5,12 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 from functools import wraps
 from config import Config
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
 import io
+import base64
+import struct
+import threading
 
 try:
     from reportlab.lib.pagesizes import letter
@@ -39,29 +43,37 @@ class User(db.Model, UserMixin):
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
-    barcode = db.Column(db.String(64), unique=True, nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    barcode = db.Column(db.String(64), unique=True, index=True, nullable=False)
+    price = db.Column(db.Integer, nullable=False)  # paise
     stock = db.Column(db.Integer, default=0, nullable=False)
     low_stock = db.Column(db.Boolean, nullable=False, default=False)
     image_url = db.Column(db.String(255), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_product_name_lower', db.func.lower(name)),
+        db.Index('ix_product_barcode_lower', db.func.lower(barcode)),
+    )
+
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     cashier_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    total = db.Column(db.Float, nullable=False, default=0.0)
-    paid_cash = db.Column(db.Float, nullable=False, default=0.0)
-    change_due = db.Column(db.Float, nullable=False, default=0.0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    payment_method = db.Column(db.String(20), nullable=False, default='cash')  # cash, card, upi, wallet
+    # Amounts in paise
+    total = db.Column(db.Integer, nullable=False, default=0)
+    paid_cash = db.Column(db.Integer, nullable=False, default=0)
+    change_due = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    payment_method = db.Column(db.String(20), nullable=False, default='cash', index=True)  # cash, card, upi, wallet
 
     cashier = db.relationship('User')
 
+    __table_args__ = (db.Index('ix_order_created_payment', 'created_at', 'payment_method'),)
+
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
-    unit_price = db.Column(db.Float, nullable=False)
+    unit_price = db.Column(db.Integer, nullable=False)  # paise
 
     order = db.relationship('Order', backref=db.backref('items', lazy=True))
     product = db.relationship('Product')
@@ -74,11 +86,76 @@ class PromoCode(db.Model):
     active = db.Column(db.Boolean, nullable=False, default=True)
     expires_at = db.Column(db.DateTime, nullable=True)
 
+class DailySales(db.Model):
+    """Per-day sales rollup, maintained at checkout so reports never scan orders."""
+    date = db.Column(db.Date, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)  # paise
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+# Default catalogue images, keyed by product name
+PRODUCT_IMAGES = {
+    "Men's T-Shirt": "https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=300&h=300&fit=crop",
+    "Women's Handbag": "https://images.unsplash.com/photo-1553062407-98eeb64c6a62?w=300&h=300&fit=crop",
+    "Bluetooth Earbuds": "https://images.unsplash.com/photo-1606220945770-b5b6c2c55bf1?w=300&h=300&fit=crop",
+    "Laptop 14": "https://images.unsplash.com/photo-1496181133206-80ce9b88a853?w=300&h=300&fit=crop",
+    "Kids Sneakers": "https://images.unsplash.com/photo-1542291026-7eec264c27ff?w=300&h=300&fit=crop",
+    "Smartwatch": "https://images.unsplash.com/photo-1523275335684-37898b6baf30?w=300&h=300&fit=crop",
+    "Saree Silk": "https://images.unsplash.com/photo-1594633312681-425c7b97ccd1?w=300&h=300&fit=crop",
+    "Apple - 1 kg": "https://images.unsplash.com/photo-1560806887-1e4cd0b6cbd6?w=300&h=300&fit=crop",
+    "Milk - 1 L": "https://images.unsplash.com/photo-1550583724-b2692b85b150?w=300&h=300&fit=crop",
+    "Bread - 500 g": "https://images.unsplash.com/photo-1509440159596-0249088772ff?w=300&h=300&fit=crop",
+    "Toothpaste": "https://images.unsplash.com/photo-1556228720-195a672e8a03?w=300&h=300&fit=crop",
+    "Shampoo 200ml": "https://images.unsplash.com/photo-1556228720-195a672e8a03?w=300&h=300&fit=crop",
+    "Biscuits - 200 g": "https://images.unsplash.com/photo-1555507036-ab1f4038808a?w=300&h=300&fit=crop",
+    "Rice - 5 kg": "https://images.unsplash.com/photo-1586201375761-83865001e31c?w=300&h=300&fit=crop"
+}
+
+# ----------------- Money helpers -----------------
+
+def to_paise(amount) -> int:
+    """Convert a rupee amount (e.g. form input) to integer paise."""
+    return int(round(float(amount) * 100))
+
+@app.template_filter("rupees")
+def rupees(paise) -> str:
+    """Format integer paise as a rupee amount, e.g. 79900 -> '799.00'."""
+    return f"{paise / 100:.2f}"
+
+def promo_discount_paise(pc, subtotal: int) -> int:
+    if pc.discount_type == 'percent':
+        return int(round(subtotal * pc.discount_value / 100))
+    return min(subtotal, to_paise(pc.discount_value))
+
 # ----------------- Auth helpers -----------------
 
+class SessionUser(UserMixin):
+    """Detached snapshot of a User, safe to keep between requests."""
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.role = user.role
+
+# user id -> (expires, SessionUser); saves a query on every authenticated request
+_user_cache = {}
+USER_CACHE_TTL = timedelta(seconds=60)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    now = datetime.utcnow()
+    hit = _user_cache.get(user_id)
+    if hit and hit[0] > now:
+        return hit[1]
+    user = User.query.get(int(user_id))
+    if not user:
+        return None
+    if len(_user_cache) >= 256:
+        _user_cache.clear()
+    _user_cache[user_id] = (now + USER_CACHE_TTL, SessionUser(user))
+    return _user_cache[user_id][1]
+
+def forget_user(user_id):
+    """Drop a cached user, e.g. after their password or role changes."""
+    _user_cache.pop(str(user_id), None)
 
 def role_required(*roles):
     def decorator(fn):
@@ -119,12 +196,24 @@ def initdb_command():
         ("Smartwatch", "ELEC003", 6999.00, 35, "https://images.unsplash.com/photo-1523275335684-37898b6baf30?w=300&h=300&fit=crop"),
         ("Saree Silk", "CLOTH003", 3999.00, 25, "https://images.unsplash.com/photo-1594633312681-425c7b97ccd1?w=300&h=300&fit=crop"),
     ]
-    for name, barcode, price, stock, image_url in sample:
-        db.session.add(Product(name=name, barcode=barcode, price=price, stock=stock, image_url=image_url))
+    product_rows = [
+        {"name": name, "barcode": barcode, "price": to_paise(price), "stock": stock, "low_stock": False, "image_url": image_url}
+        for name, barcode, price, stock, image_url in sample
+    ]
+    db.session.execute(Product.__table__.insert(), product_rows)
 
     db.session.commit()
     print("Database initialized. Users: admin/admin123, cashier/cashier123")
 
+@app.cli.command("backfill-daily-sales")
+def backfill_daily_sales_command():
+    """Rebuild the daily sales rollup from existing orders.\n
+    Usage: flask --app app backfill-daily-sales
+    """
+    upgrade_db()  # order totals must already be in paise
+    days = rebuild_daily_sales()
+    print(f"Daily sales rebuilt for {days} days.")
+
 # ----------------- Reports helpers -----------------
 
 def daterange_days(n):
@@ -133,20 +222,231 @@ def daterange_days(n):
 
 def summarize_range(days: int):
     dates = daterange_days(days)
+    rows = DailySales.query.filter(DailySales.date >= dates[0]).all()
+    by_day = {r.date: (r.total, r.orders) for r in rows}
     data = []
     for day in dates:
-        start = datetime(day.year, day.month, day.day)
-        end = start + timedelta(days=1)
-        q = Order.query.filter(Order.created_at >= start, Order.created_at < end)
-        total = sum(o.total for o in q)
-        count = q.count()
+        total, count = by_day.get(day, (0, 0))
         data.append({
             "date": day.strftime('%Y-%m-%d'),
-            "total": round(total, 2),
+            "total": total,
             "orders": count,
         })
     return data
 
+def record_daily_sale(order):
+    """Add an order to the DailySales rollup (upsert, same transaction as the order)."""
+    insert = postgresql.insert if db.engine.dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(DailySales.__table__).values(date=order.created_at.date(), total=order.total, orders=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailySales.__table__.c.date],
+        set_={"total": DailySales.__table__.c.total + stmt.excluded.total,
+              "orders": DailySales.__table__.c.orders + 1},
+    )
+    db.session.execute(stmt)
+
+def rebuild_daily_sales():
+    """Recompute the DailySales rollup from the order table."""
+    day_col = db.func.date(Order.created_at).label('d')
+    rows = db.session.query(day_col, db.func.sum(Order.total), db.func.count(Order.id)).group_by(day_col).all()
+    DailySales.__table__.create(db.engine, checkfirst=True)
+    db.session.execute(DailySales.__table__.delete())
+    if rows:
+        db.session.execute(DailySales.__table__.insert(), [
+            {"date": datetime.strptime(str(d), '%Y-%m-%d').date(), "total": total or 0, "orders": count}
+            for d, total, count in rows
+        ])
+    db.session.commit()
+    return len(rows)
+
+def sales_summary(range_key: str):
+    if range_key == "daily":
+        data = summarize_range(7)
+    elif range_key == "weekly":
+        # 12 weeks ~= 84 days, aggregate by week
+        raw = summarize_range(84)
+        buckets = {}
+        for d in raw:
+            week = datetime.strptime(d["date"], "%Y-%m-%d").strftime("%Y-W%U")
+            b = buckets.setdefault(week, {"label": week, "total": 0, "orders": 0})
+            b["total"] += d["total"]
+            b["orders"] += d["orders"]
+        data = [{"label": k, "total": v["total"], "orders": v["orders"]} for k, v in sorted(buckets.items())][-12:]
+        return {"range": "weekly", "series": data}
+    elif range_key == "monthly":
+        # 12 months aggregation
+        now = datetime.utcnow()
+        months = []
+        for i in range(11, -1, -1):
+            y, m = divmod(now.year * 12 + now.month - 1 - i, 12)
+            months.append((y, m + 1))
+        rows = DailySales.query.filter(DailySales.date >= datetime(months[0][0], months[0][1], 1).date()).all()
+        by_month = {}
+        for r in rows:
+            label = r.date.strftime('%Y-%m')
+            total, count = by_month.get(label, (0, 0))
+            by_month[label] = (total + r.total, count + r.orders)
+        series = []
+        for y, m in months:
+            label = f"{y}-{m:02d}"
+            total, count = by_month.get(label, (0, 0))
+            series.append({"label": label, "total": total, "orders": count})
+        return {"range": "monthly", "series": series}
+    else:
+        data = summarize_range(7)
+    return {"range": "daily", "series": data}
+
+# Short-lived cache of sales summaries, keyed by range and current hour
+_sales_summary_cache = {}
+
+def cached_sales_summary(range_key: str):
+    now = datetime.utcnow()
+    key = (range_key, now.replace(minute=0, second=0, microsecond=0))
+    hit = _sales_summary_cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+    data = sales_summary(range_key)
+    ttl = timedelta(seconds=app.config["SALES_SUMMARY_CACHE_TTL"])
+    if len(_sales_summary_cache) >= 8:
+        _sales_summary_cache.clear()
+    _sales_summary_cache[key] = (now + ttl, data)
+    return data
+
+def dashboard_stats():
+    total_products = Product.query.count()
+    low_stock_count = Product.query.filter_by(low_stock=True).count()
+    # Totals and payment method breakdown in one pass
+    rows = db.session.query(Order.payment_method, db.func.count(Order.id), db.func.sum(Order.total)) \
+        .group_by(Order.payment_method).all()
+    by_method = {pm: c for pm, c, _ in rows}
+    return {
+        "total_products": total_products,
+        "total_orders": sum(c for _, c, _ in rows),
+        "total_sales": sum(s or 0 for _, _, s in rows),
+        "low_stock_count": low_stock_count,
+        "cash_count": by_method.get('cash', 0),
+        "card_count": by_method.get('card', 0),
+        "upi_count": by_method.get('upi', 0),
+        "wallet_count": by_method.get('wallet', 0),
+    }
+
+# Dashboard figures are cached rather than the rendered page, so flash
+# messages still render per request
+_dashboard_cache = {}
+
+def cached_dashboard_stats():
+    now = datetime.utcnow()
+    hit = _dashboard_cache.get("stats")
+    if hit and hit[0] > now:
+        return hit[1]
+    stats = dashboard_stats()
+    _dashboard_cache["stats"] = (now + timedelta(seconds=app.config["DASHBOARD_CACHE_TTL"]), stats)
+    return stats
+
+def invalidate_report_caches():
+    _sales_summary_cache.clear()
+    _dashboard_cache.clear()
+
+def prefix_range(expr, term: str):
+    """`expr` starts with lower(term), written as a range so an index on `expr` applies."""
+    lo = db.func.lower(term)
+    return db.and_(expr >= lo, expr < lo + '\U0010ffff')
+
+def search_products(q: str, limit=None):
+    """Search products by name or barcode prefix (case-insensitive).
+    Terms containing % or _ are matched as an ILIKE pattern, e.g. %shirt."""
+    query = Product.query
+    if q and ('%' in q or '_' in q):
+        query = query.filter(db.or_(Product.name.ilike(q), Product.barcode.ilike(q)))
+    elif q:
+        query = query.filter(db.or_(prefix_range(db.func.lower(Product.name), q),
+                                    prefix_range(db.func.lower(Product.barcode), q)))
+    query = query.order_by(Product.name.asc())
+    return query.limit(limit) if limit else query
+
+# ----------------- DB upgrade -----------------
+
+def upgrade_db():
+    """Create missing tables and bring an existing database up to the current schema."""
+    db.create_all()
+    inspector = db.inspect(db.engine)
+    columns_order = [c['name'] for c in inspector.get_columns('order')]
+    if 'payment_method' not in columns_order:
+        with db.engine.connect() as conn:
+            conn.execute(text("ALTER TABLE \"order\" ADD COLUMN payment_method VARCHAR(20) NOT NULL DEFAULT 'cash'"))
+            conn.commit()
+    indexes_order = [i['name'] for i in inspector.get_indexes('order')]
+    if 'ix_order_created_payment' not in indexes_order:
+        with db.engine.connect() as conn:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_order_created_at ON \"order\" (created_at)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_order_payment_method ON \"order\" (payment_method)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_order_created_payment ON \"order\" (created_at, payment_method)"))
+            conn.commit()
+    columns_product = [c['name'] for c in inspector.get_columns('product')]
+    # Expression indexes can't be reflected, so rely on IF NOT EXISTS
+    with db.engine.connect() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_product_name_lower ON product (lower(name))"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_product_barcode_lower ON product (lower(barcode))"))
+        conn.commit()
+    if 'low_stock' not in columns_product:
+        with db.engine.connect() as conn:
+            conn.execute(text("ALTER TABLE product ADD COLUMN low_stock BOOLEAN NOT NULL DEFAULT 0"))
+            conn.commit()
+    if 'image_url' not in columns_product:
+        with db.engine.connect() as conn:
+            conn.execute(text("ALTER TABLE product ADD COLUMN image_url VARCHAR(255)"))
+            conn.commit()
+        # Update existing products with images
+        product_table = Product.__table__
+        stmt = product_table.update().where(
+            product_table.c.name == bindparam('b_name'),
+            db.or_(product_table.c.image_url.is_(None), product_table.c.image_url == ''),
+        ).values(image_url=bindparam('b_url'))
+        db.session.execute(stmt, [{"b_name": n, "b_url": u} for n, u in PRODUCT_IMAGES.items()])
+        db.session.commit()
+    # Money columns moved from FLOAT rupees to INTEGER paise
+    money_columns = [("product", "price"), ("order", "total"), ("order", "paid_cash"),
+                     ("order", "change_due"), ("order_item", "unit_price")]
+    for table, column in money_columns:
+        col = next(c for c in inspector.get_columns(table) if c['name'] == column)
+        if not isinstance(col['type'], db.Integer):
+            if db.engine.dialect.name == "sqlite" and db.engine.dialect.server_version_info < (3, 35, 0):
+                raise RuntimeError(
+                    f"Converting {table}.{column} to paise needs SQLite 3.35+ (found "
+                    f"{'.'.join(map(str, db.engine.dialect.server_version_info))}); upgrade SQLite and restart."
+                )
+            with db.engine.connect() as conn:
+                conn.execute(text(f"ALTER TABLE \"{table}\" ADD COLUMN {column}_paise INTEGER NOT NULL DEFAULT 0"))
+                conn.execute(text(f"UPDATE \"{table}\" SET {column}_paise = CAST(ROUND({column} * 100) AS INTEGER)"))
+                conn.execute(text(f"ALTER TABLE \"{table}\" DROP COLUMN {column}"))
+                conn.execute(text(f"ALTER TABLE \"{table}\" RENAME COLUMN {column}_paise TO {column}"))
+                conn.commit()
+    # Backfill the sales rollup the first time it appears
+    if not DailySales.query.first() and Order.query.first():
+        rebuild_daily_sales()
+
+@app.cli.command("upgrade-db")
+def upgrade_db_command():
+    """Upgrade an existing database in place.\n
+    Usage: flask --app app upgrade-db
+    """
+    upgrade_db()
+    print("Database upgraded.")
+
+# Also runs on the first request, so `flask run` never serves an old schema
+_db_upgraded = False
+_db_upgrade_lock = threading.Lock()
+
+@app.before_request
+def ensure_db_upgraded():
+    global _db_upgraded
+    if _db_upgraded:
+        return
+    with _db_upgrade_lock:
+        if not _db_upgraded:
+            upgrade_db()
+            _db_upgraded = True
+
 # ----------------- Routes -----------------
 
 @app.route("/")
@@ -176,6 +476,7 @@ def login():
 @app.route("/logout")
 @login_required
 def logout():
+    forget_user(current_user.id)
     logout_user()
     return redirect(url_for("login"))
 
@@ -211,78 +512,24 @@ def register():
 @login_required
 @role_required("admin")
 def admin_dashboard():
-    total_products = Product.query.count()
-    total_orders = Order.query.count()
-    total_sales = db.session.query(db.func.sum(Order.total)).scalar() or 0
-    low_stock_count = Product.query.filter_by(low_stock=True).count()
-    # Payment method breakdown
-    cash_count = db.session.query(db.func.count()).select_from(Order).filter_by(payment_method='cash').scalar() or 0
-    card_count = db.session.query(db.func.count()).select_from(Order).filter_by(payment_method='card').scalar() or 0
-    upi_count = db.session.query(db.func.count()).select_from(Order).filter_by(payment_method='upi').scalar() or 0
-    wallet_count = db.session.query(db.func.count()).select_from(Order).filter_by(payment_method='wallet').scalar() or 0
-    return render_template("admin_dashboard.html",
-                           total_products=total_products,
-                           total_orders=total_orders,
-                           total_sales=total_sales,
-                           low_stock_count=low_stock_count,
-                           cash_count=cash_count,
-                           card_count=card_count,
-                           upi_count=upi_count,
-                           wallet_count=wallet_count)
+    return render_template("admin_dashboard.html", **cached_dashboard_stats())
 
 @app.route("/admin/api/sales_summary")
 @login_required
 @role_required("admin")
 def admin_sales_summary():
     range_key = request.args.get("range", "daily")
-    if range_key == "daily":
-        data = summarize_range(7)
-    elif range_key == "weekly":
-        # 12 weeks ~= 84 days, aggregate by week
-        raw = summarize_range(84)
-        buckets = {}
-        for d in raw:
-            week = datetime.strptime(d["date"], "%Y-%m-%d").strftime("%Y-W%U")
-            b = buckets.setdefault(week, {"label": week, "total": 0.0, "orders": 0})
-            b["total"] += d["total"]
-            b["orders"] += d["orders"]
-        data = [{"label": k, "total": round(v["total"], 2), "orders": v["orders"]} for k, v in sorted(buckets.items())][-12:]
-        return jsonify({"range": "weekly", "series": data})
-    elif range_key == "monthly":
-        # 12 months aggregation
-        now = datetime.utcnow()
-        first = datetime(now.year, now.month, 1)
-        months = []
-        for i in range(11, -1, -1):
-            m = first - timedelta(days=30*i)
-            months.append((m.year, m.month))
-        series = []
-        for y, m in months:
-            start = datetime(y, m, 1)
-            if m == 12:
-                end = datetime(y+1, 1, 1)
-            else:
-                end = datetime(y, m+1, 1)
-            q = Order.query.filter(Order.created_at >= start, Order.created_at < end)
-            total = sum(o.total for o in q)
-            count = q.count()
-            series.append({"label": f"{y}-{m:02d}", "total": round(total, 2), "orders": count})
-        return jsonify({"range": "monthly", "series": series})
-    else:
-        data = summarize_range(7)
-    return jsonify({"range": "daily", "series": data})
+    data = cached_sales_summary(range_key)
+    # totals are kept in paise; the chart plots rupees
+    series = [{**row, "total": row["total"] / 100} for row in data["series"]]
+    return jsonify({"range": data["range"], "series": series})
 
 @app.route("/admin/products")
 @login_required
 @role_required("admin")
 def products_list():
     q = request.args.get("q", "").strip()
-    products = Product.query
-    if q:
-        products = products.filter(
-            db.or_(Product.name.ilike(f"%{q}%"), Product.barcode.ilike(f"%{q}%"))
-        )
-    products = products.order_by(Product.name.asc()).all()
+    products = search_products(q).all()
     return render_template("products.html", products=products, q=q)
 
 @app.route("/admin/products/new", methods=["GET", "POST"])
@@ -292,7 +539,7 @@ def product_new():
     if request.method == "POST":
         name = request.form["name"].strip()
         barcode = request.form["barcode"].strip()
-        price = float(request.form["price"])
+        price = to_paise(request.form["price"])
         stock = int(request.form.get("stock", 0))
         image_url = request.form.get("image_url", "").strip()
         if Product.query.filter_by(barcode=barcode).first():
@@ -300,6 +547,7 @@ def product_new():
             return redirect(url_for("product_new"))
         db.session.add(Product(name=name, barcode=barcode, price=price, stock=stock, image_url=image_url))
         db.session.commit()
+        invalidate_report_caches()
         flash("Product created.", "success")
         return redirect(url_for("products_list"))
     return render_template("product_form.html", product=None)
@@ -310,13 +558,15 @@ def product_new():
 def product_edit(pid):
     product = Product.query.get_or_404(pid)
     if request.method == "POST":
+        forget_barcode(product.barcode)
         product.name = request.form["name"].strip()
         product.barcode = request.form["barcode"].strip()
-        product.price = float(request.form["price"])
+        product.price = to_paise(request.form["price"])
         product.stock = int(request.form.get("stock", 0))
         product.low_stock = bool(request.form.get("low_stock"))
         product.image_url = request.form.get("image_url", "").strip()
         db.session.commit()
+        invalidate_report_caches()
         flash("Product updated.", "success")
         return redirect(url_for("products_list"))
     return render_template("product_form.html", product=product)
@@ -326,8 +576,10 @@ def product_edit(pid):
 @role_required("admin")
 def product_delete(pid):
     product = Product.query.get_or_404(pid)
+    forget_barcode(product.barcode)
     db.session.delete(product)
     db.session.commit()
+    invalidate_report_caches()
     flash("Product deleted.", "success")
     return redirect(url_for("products_list"))
 
@@ -337,8 +589,10 @@ def product_delete(pid):
 @login_required
 @role_required("admin")
 def orders_list():
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    return render_template("orders.html", orders=orders)
+    page = request.args.get("page", 1, type=int)
+    pagination = Order.query.options(db.joinedload(Order.cashier)) \
+        .order_by(Order.created_at.desc()).paginate(page=page, per_page=50, error_out=False)
+    return render_template("orders.html", orders=pagination.items, pagination=pagination)
 
 # ----------------- Admin: Promo Codes -----------------
 
@@ -383,39 +637,63 @@ def promocode_toggle(pid):
 @role_required("admin")
 def update_product_images():
     """Update all products with appropriate images"""
-    products = Product.query.all()
-    image_mapping = {
-        "Men's T-Shirt": "https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=300&h=300&fit=crop",
-        "Women's Handbag": "https://images.unsplash.com/photo-1553062407-98eeb64c6a62?w=300&h=300&fit=crop",
-        "Bluetooth Earbuds": "https://images.unsplash.com/photo-1606220945770-b5b6c2c55bf1?w=300&h=300&fit=crop",
-        "Laptop 14": "https://images.unsplash.com/photo-1496181133206-80ce9b88a853?w=300&h=300&fit=crop",
-        "Kids Sneakers": "https://images.unsplash.com/photo-1542291026-7eec264c27ff?w=300&h=300&fit=crop",
-        "Smartwatch": "https://images.unsplash.com/photo-1523275335684-37898b6baf30?w=300&h=300&fit=crop",
-        "Saree Silk": "https://images.unsplash.com/photo-1594633312681-425c7b97ccd1?w=300&h=300&fit=crop",
-        "Apple - 1 kg": "https://images.unsplash.com/photo-1560806887-1e4cd0b6cbd6?w=300&h=300&fit=crop",
-        "Milk - 1 L": "https://images.unsplash.com/photo-1550583724-b2692b85b150?w=300&h=300&fit=crop",
-        "Bread - 500 g": "https://images.unsplash.com/photo-1509440159596-0249088772ff?w=300&h=300&fit=crop",
-        "Toothpaste": "https://images.unsplash.com/photo-1556228720-195a672e8a03?w=300&h=300&fit=crop",
-        "Shampoo 200ml": "https://images.unsplash.com/photo-1556228720-195a672e8a03?w=300&h=300&fit=crop",
-        "Biscuits - 200 g": "https://images.unsplash.com/photo-1555507036-ab1f4038808a?w=300&h=300&fit=crop",
-        "Rice - 5 kg": "https://images.unsplash.com/photo-1586201375761-83865001e31c?w=300&h=300&fit=crop"
-    }
-    updated_count = 0
-    for product in products:
-        if product.name in image_mapping:
-            product.image_url = image_mapping[product.name]
-            updated_count += 1
+    product_table = Product.__table__
+    stmt = product_table.update().where(product_table.c.name == bindparam('b_name')).values(image_url=bindparam('b_url'))
+    result = db.session.execute(stmt, [{"b_name": n, "b_url": u} for n, u in PRODUCT_IMAGES.items()])
+    updated_count = result.rowcount
     db.session.commit()
     flash(f"Updated {updated_count} products with images.", "success")
     return redirect(url_for('products_list'))
 
 # ----------------- Cashier: POS -----------------
 
+# Barcode -> product id, kept briefly to absorb repeat scans
+_barcode_cache = {}
+BARCODE_CACHE_MAX = 2048
+BARCODE_CACHE_TTL = timedelta(seconds=30)
+
+def get_product_ids_by_barcode(codes):
+    """Resolve barcodes to product ids, querying only the ones not cached."""
+    now = datetime.utcnow()
+    found = {}
+    missing = []
+    for code in codes:
+        hit = _barcode_cache.get(code)
+        if hit and hit[0] > now:
+            found[code] = hit[1]
+        else:
+            missing.append(code)
+    if missing:
+        rows = db.session.query(Product.barcode, Product.id).filter(Product.barcode.in_(missing)).all()
+        if len(_barcode_cache) + len(rows) > BARCODE_CACHE_MAX:
+            _barcode_cache.clear()
+        for code, pid in rows:
+            _barcode_cache[code] = (now + BARCODE_CACHE_TTL, pid)
+            found[code] = pid
+    return found
+
+def forget_barcode(code):
+    _barcode_cache.pop(code, None)
+
+# The cart lives in the session cookie as base64 of packed (product id, qty)
+# pairs, which is much smaller than a JSON dict of string keys
+CART_ITEM = struct.Struct("!IH")
+CART_MAX_PID = 0xFFFFFFFF
+CART_MAX_QTY = 0xFFFF
+
 def get_cart():
-    return session.setdefault("cart", {})
+    """Return the cart as {product_id: qty}."""
+    raw = session.get("cart")
+    if not raw:
+        return {}
+    if isinstance(raw, dict):  # cookies written before the packed format
+        return {int(pid): qty for pid, qty in raw.items()}
+    data = base64.b64decode(raw)
+    return {pid: qty for pid, qty in CART_ITEM.iter_unpack(data)}
 
 def set_cart(cart):
-    session["cart"] = cart
+    data = b"".join(CART_ITEM.pack(pid, qty) for pid, qty in cart.items())
+    session["cart"] = base64.b64encode(data).decode("ascii")
     session.modified = True
 
 @app.route("/pos", methods=["GET", "POST"])
@@ -431,17 +709,28 @@ def pos():
             if not code:
                 flash("Scan or enter a barcode.", "warning")
             else:
-                product = Product.query.filter_by(barcode=code).first()
-                if not product:
-                    flash("Product not found.", "danger")
-                else:
-                    pid = str(product.id)
-                    cart[pid] = cart.get(pid, 0) + 1
-                    set_cart(cart)
+                # Barcodes may contain spaces/commas, so try the whole input first and
+                # only treat it as several codes from a batch scan when that misses
+                codes = [code]
+                found = get_product_ids_by_barcode(codes)
+                if code not in found:
+                    split = code.replace(",", " ").split()
+                    if len(split) > 1:
+                        codes = split
+                        found = get_product_ids_by_barcode(set(codes))
+                for code in codes:
+                    if code not in found:
+                        flash(f"Product not found: {code}" if len(codes) > 1 else "Product not found.", "danger")
+                        continue
+                    pid = found[code]
+                    cart[pid] = min(cart.get(pid, 0) + 1, CART_MAX_QTY)
+                set_cart(cart)
         elif action == "update_qty":
-            pid = request.form.get("pid")
-            qty = max(0, int(request.form.get("qty", 1)))
-            if qty == 0:
+            pid = request.form.get("pid", type=int)
+            qty = min(max(0, int(request.form.get("qty", 1))), CART_MAX_QTY)
+            if pid is None or not 0 < pid <= CART_MAX_PID:
+                flash("Unknown product.", "warning")
+            elif qty == 0:
                 cart.pop(pid, None)
             else:
                 cart[pid] = qty
@@ -450,30 +739,33 @@ def pos():
             set_cart({})
         elif action == "mark_low":
             pid = int(request.form.get("pid"))
-            product = Product.query.get_or_404(pid)
+            product = db.get_or_404(Product, pid)
             product.low_stock = True
             db.session.commit()
+            invalidate_report_caches()
             flash(f"Marked '{product.name}' as low stock.", "info")
         elif action == "unmark_low":
             pid = int(request.form.get("pid"))
-            product = Product.query.get_or_404(pid)
+            product = db.get_or_404(Product, pid)
             product.low_stock = False
             db.session.commit()
+            invalidate_report_caches()
             flash(f"Unmarked '{product.name}' from low stock.", "info")
         elif action == "add_by_id":
             pid = int(request.form.get("pid"))
-            product = Product.query.get(pid)
+            product = db.session.get(Product, pid)
             if product:
-                sid = str(product.id)
-                cart[sid] = cart.get(sid, 0) + 1
+                cart[product.id] = min(cart.get(product.id, 0) + 1, CART_MAX_QTY)
                 set_cart(cart)
         return redirect(url_for("pos"))
 
     # Build detailed cart
     items = []
-    subtotal = 0.0
+    subtotal = 0
+    ids = list(cart.keys())
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(ids)).all()} if ids else {}
     for pid, qty in cart.items():
-        product = Product.query.get(int(pid))
+        product = products.get(pid)
         if product:
             line_total = product.price * qty
             subtotal += line_total
@@ -489,24 +781,18 @@ def pos():
 
     # promo support
     promo_code = request.args.get('promo', '').strip().upper()
-    promo_discount = 0.0
+    promo_discount = 0
     if promo_code:
         pc = PromoCode.query.filter_by(code=promo_code, active=True).first()
         if pc and (pc.expires_at is None or pc.expires_at >= datetime.utcnow()):
-            if pc.discount_type == 'percent':
-                promo_discount = round(subtotal * (pc.discount_value/100.0), 2)
-            else:
-                promo_discount = min(subtotal, pc.discount_value)
+            promo_discount = promo_discount_paise(pc, subtotal)
         else:
             flash("Invalid or expired promo code.", "warning")
-    total_after_discount = max(0.0, round(subtotal - promo_discount, 2))
+    total_after_discount = max(0, subtotal - promo_discount)
 
     # Available products list for quick add
     q = request.args.get("q", "").strip()
-    plist = Product.query
-    if q:
-        plist = plist.filter(db.or_(Product.name.ilike(f"%{q}%"), Product.barcode.ilike(f"%{q}%")))
-    plist = plist.order_by(Product.name.asc()).limit(50).all()
+    plist = search_products(q, limit=50).all()
 
     return render_template("pos.html", items=items, subtotal=subtotal, products=plist, q=q, promo_code=promo_code, promo_discount=promo_discount, total_after_discount=total_after_discount)
 
@@ -520,9 +806,14 @@ def checkout():
         return redirect(url_for("pos"))
 
     # Compute totals
-    subtotal = 0.0
+    subtotal = 0
+    ids = list(cart.keys())
+    # Only the columns checkout needs, without hydrating Product objects
+    products = {p.id: p for p in db.session.execute(
+        db.select(Product.id, Product.name, Product.price, Product.stock).where(Product.id.in_(ids))
+    ).all()}
     for pid, qty in cart.items():
-        product = Product.query.get(int(pid))
+        product = products.get(pid)
         if not product or product.stock < qty:
             flash(f"Insufficient stock for {product.name if product else 'Unknown'}", "danger")
             return redirect(url_for("pos"))
@@ -532,32 +823,29 @@ def checkout():
 
     # Apply promo code from form
     promo_code = request.form.get('promo_code', '').strip().upper()
-    promo_discount = 0.0
+    promo_discount = 0
     if promo_code:
         pc = PromoCode.query.filter_by(code=promo_code, active=True).first()
         if pc and (pc.expires_at is None or pc.expires_at >= datetime.utcnow()):
-            if pc.discount_type == 'percent':
-                promo_discount = round(subtotal * (pc.discount_value/100.0), 2)
-            else:
-                promo_discount = min(subtotal, pc.discount_value)
+            promo_discount = promo_discount_paise(pc, subtotal)
         else:
             flash("Invalid or expired promo code.", "warning")
             return redirect(url_for('pos', promo=promo_code))
 
-    total_due = max(0.0, round(subtotal - promo_discount, 2))
+    total_due = max(0, subtotal - promo_discount)
 
     # Normalize amounts
-    amount_paid = 0.0
-    change_due = 0.0
+    amount_paid = 0
+    change_due = 0
     if payment_method == "cash":
-        amount_paid = float(request.form.get("paid_cash", 0.0))
+        amount_paid = to_paise(request.form.get("paid_cash") or 0)
         if amount_paid < total_due:
             flash("Paid amount is less than total.", "danger")
             return redirect(url_for("pos", promo=promo_code))
-        change_due = round(amount_paid - total_due, 2)
+        change_due = amount_paid - total_due
     else:
         amount_paid = total_due
-        change_due = 0.0
+        change_due = 0
 
     # Create order
     order = Order(
@@ -571,11 +859,20 @@ def checkout():
     db.session.flush()  # get order.id
 
     # Create items and update stock
+    rows = []
     for pid, qty in cart.items():
-        product = Product.query.get(int(pid))
-        db.session.add(OrderItem(order_id=order.id, product_id=product.id, quantity=qty, unit_price=product.price))
-        product.stock -= qty
+        product = products[pid]
+        rows.append({"order_id": order.id, "product_id": product.id, "quantity": qty, "unit_price": product.price})
+    db.session.execute(OrderItem.__table__.insert(), rows)
+    # One UPDATE ... CASE for every line's stock decrement
+    sold = db.case({r["product_id"]: r["quantity"] for r in rows}, value=Product.__table__.c.id)
+    db.session.execute(
+        Product.__table__.update().where(Product.__table__.c.id.in_(ids))
+        .values(stock=Product.__table__.c.stock - sold)
+    )
+    record_daily_sale(order)
     db.session.commit()
+    invalidate_report_caches()
 
     set_cart({})
     return redirect(url_for("receipt", order_id=order.id))
@@ -584,19 +881,16 @@ def checkout():
 @login_required
 @role_required("cashier", "admin")
 def receipt(order_id):
-    order = Order.query.get_or_404(order_id)
+    order = Order.query.options(
+        db.joinedload(Order.cashier),
+        db.selectinload(Order.items).joinedload(OrderItem.product),
+    ).get_or_404(order_id)
     return render_template("receipt.html", order=order)
 
-@app.route("/receipt/<int:order_id>/pdf")
-@login_required
-@role_required("cashier", "admin")
-def receipt_pdf(order_id):
-    order = Order.query.get_or_404(order_id)
-    if not REPORTLAB_AVAILABLE:
-        flash("PDF generator not available on server.", "warning")
-        return redirect(url_for('receipt', order_id=order.id))
-    buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=letter)
+CURRENCY = "₹ "
+
+def draw_receipt(c, order):
+    """Draw one order's receipt onto the canvas, ending with a page break."""
     width, height = letter
     y = height - 50
     c.setFont("Helvetica-Bold", 14)
@@ -621,71 +915,77 @@ def receipt_pdf(order_id):
     for it in order.items:
         if y < 80:
             c.showPage(); y = height - 50
+            # a new page starts with ReportLab's default font
+            c.setFont("Helvetica", 10)
         c.drawString(50, y, it.product.name)
         c.drawRightString(330, y, str(it.quantity))
-        c.drawRightString(400, y, f"₹ {it.unit_price:.2f}")
-        c.drawRightString(500, y, f"₹ {it.unit_price * it.quantity:.2f}")
+        c.drawRightString(400, y, f"{CURRENCY}{rupees(it.unit_price)}")
+        c.drawRightString(500, y, f"{CURRENCY}{rupees(it.unit_price * it.quantity)}")
         y -= 14
     y -= 10
     c.setFont("Helvetica-Bold", 11)
-    c.drawRightString(500, y, f"Total: ₹ {order.total:.2f}")
+    c.drawRightString(500, y, f"Total: {CURRENCY}{rupees(order.total)}")
     y -= 16
     c.setFont("Helvetica", 10)
-    c.drawRightString(500, y, f"Paid: ₹ {order.paid_cash:.2f}")
+    c.drawRightString(500, y, f"Paid: {CURRENCY}{rupees(order.paid_cash)}")
     y -= 14
-    c.drawRightString(500, y, f"Change: ₹ {order.change_due:.2f}")
+    c.drawRightString(500, y, f"Change: {CURRENCY}{rupees(order.change_due)}")
     c.showPage()
+
+def receipt_orders_query():
+    return Order.query.options(
+        db.joinedload(Order.cashier),
+        db.selectinload(Order.items).joinedload(OrderItem.product),
+    )
+
+@app.route("/receipt/<int:order_id>/pdf")
+@login_required
+@role_required("cashier", "admin")
+def receipt_pdf(order_id):
+    order = receipt_orders_query().get_or_404(order_id)
+    if not REPORTLAB_AVAILABLE:
+        flash("PDF generator not available on server.", "warning")
+        return redirect(url_for('receipt', order_id=order.id))
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=letter)
+    draw_receipt(c, order)
     c.save()
     buf.seek(0)
+    # send_file streams straight from the BytesIO, no extra copy of the PDF
     return send_file(buf, as_attachment=True, download_name=f"receipt_{order.id}.pdf", mimetype="application/pdf")
 
+MAX_BATCH_RECEIPTS = 100
+
+@app.route("/receipts/pdf")
+@login_required
+@role_required("cashier", "admin")
+def receipts_pdf():
+    """Print several receipts as one PDF, e.g. /receipts/pdf?ids=1,2,3"""
+    try:
+        ids = [int(x) for x in request.args.get("ids", "").split(",") if x.strip()]
+    except ValueError:
+        abort(400)
+    if len(ids) > MAX_BATCH_RECEIPTS:
+        abort(400, f"At most {MAX_BATCH_RECEIPTS} receipts per batch.")
+    orders = {o.id: o for o in receipt_orders_query().filter(Order.id.in_(ids)).all()} if ids else {}
+    if not orders:
+        abort(404)
+    if not REPORTLAB_AVAILABLE:
+        flash("PDF generator not available on server.", "warning")
+        return redirect(url_for('pos'))
+    buf = io.BytesIO()
+    # one canvas for the whole batch, each receipt on its own page(s)
+    c = canvas.Canvas(buf, pagesize=letter)
+    for oid in ids:
+        if oid in orders:
+            draw_receipt(c, orders.pop(oid))
+    c.save()
+    buf.seek(0)
+    return send_file(buf, as_attachment=True, download_name="receipts.pdf", mimetype="application/pdf")
+
 # --------------- Run ---------------
 
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
-        # Lightweight migrations
-        try:
-            inspector = db.inspect(db.engine)
-            columns_order = [c['name'] for c in inspector.get_columns('order')]
-            if 'payment_method' not in columns_order:
-                with db.engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE \"order\" ADD COLUMN payment_method VARCHAR(20) NOT NULL DEFAULT 'cash'"))
-                    conn.commit()
-            columns_product = [c['name'] for c in inspector.get_columns('product')]
-            if 'low_stock' not in columns_product:
-                with db.engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE product ADD COLUMN low_stock BOOLEAN NOT NULL DEFAULT 0"))
-                    conn.commit()
-            if 'image_url' not in columns_product:
-                with db.engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE product ADD COLUMN image_url VARCHAR(255)"))
-                    conn.commit()
-                # Update existing products with images
-                products = Product.query.all()
-                image_mapping = {
-                    "Men's T-Shirt": "https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=300&h=300&fit=crop",
-                    "Women's Handbag": "https://images.unsplash.com/photo-1553062407-98eeb64c6a62?w=300&h=300&fit=crop",
-                    "Bluetooth Earbuds": "https://images.unsplash.com/photo-1606220945770-b5b6c2c55bf1?w=300&h=300&fit=crop",
-                    "Laptop 14": "https://images.unsplash.com/photo-1496181133206-80ce9b88a853?w=300&h=300&fit=crop",
-                    "Kids Sneakers": "https://images.unsplash.com/photo-1542291026-7eec264c27ff?w=300&h=300&fit=crop",
-                    "Smartwatch": "https://images.unsplash.com/photo-1523275335684-37898b6baf30?w=300&h=300&fit=crop",
-                    "Saree Silk": "https://images.unsplash.com/photo-1594633312681-425c7b97ccd1?w=300&h=300&fit=crop",
-                    "Apple - 1 kg": "https://images.unsplash.com/photo-1560806887-1e4cd0b6cbd6?w=300&h=300&fit=crop",
-                    "Milk - 1 L": "https://images.unsplash.com/photo-1550583724-b2692b85b150?w=300&h=300&fit=crop",
-                    "Bread - 500 g": "https://images.unsplash.com/photo-1509440159596-0249088772ff?w=300&h=300&fit=crop",
-                    "Toothpaste": "https://images.unsplash.com/photo-1556228720-195a672e8a03?w=300&h=300&fit=crop",
-                    "Shampoo 200ml": "https://images.unsplash.com/photo-1556228720-195a672e8a03?w=300&h=300&fit=crop",
-                    "Biscuits - 200 g": "https://images.unsplash.com/photo-1555507036-ab1f4038808a?w=300&h=300&fit=crop",
-                    "Rice - 5 kg": "https://images.unsplash.com/photo-1586201375761-83865001e31c?w=300&h=300&fit=crop"
-                }
-                for product in products:
-                    if product.name in image_mapping and not product.image_url:
-                        product.image_url = image_mapping[product.name]
-                db.session.commit()
-            # ensure promocode table exists
-            if not inspector.has_table('promocode'):
-                db.create_all()
-        except Exception as e:
-            print(f"Startup migration check skipped due to: {e}")
+        upgrade_db()
     app.run(debug=True)